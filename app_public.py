@@ -3,118 +3,269 @@ import pandas as pd
 import os
 from datetime import datetime
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 
-# --- THIS IS THE CRITICAL FIX FOR SERVER-SIDE PLOTTING ---
-import matplotlib
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 
-matplotlib.use("Agg")  # Use the non-interactive 'Agg' backend
-import matplotlib.pyplot as plt
 
-# --- END OF FIX ---
+DATA_DIR = "local_data_store"
+DATE_COLUMN = "date"  # the DatetimeIndex is stored as a regular Parquet column under this name
+SCAN_COLUMNS = ['HV_30D', 'IV_30D']
+SCAN_CACHE_FILENAME = "scan_cache.feather"  # consolidated scan table, kept inside DATA_DIR
+SCAN_SCHEMA = pa.schema([
+    # Annualized vols fit comfortably in float32; the scan casts on read to halve the bytes moved.
+    (DATE_COLUMN, pa.timestamp('ns')), ('HV_30D', pa.float32()), ('IV_30D', pa.float32()),
+    ('ticker', pa.string()), ('cutoff', pa.timestamp('ns')),
+])
+# Cached scan table: ticker is dictionary-encoded so the cache stores each symbol once
+# and the group_by hashes small integer codes instead of strings.
+SCAN_TABLE_SCHEMA = pa.schema([('ticker', pa.dictionary(pa.int32(), pa.string()))] +
+                              [SCAN_SCHEMA.field(name) for name in [DATE_COLUMN] + SCAN_COLUMNS])
+# Plot panels as (title, look-back offset); None marks the calendar year-to-date panel.
+TIMEFRAMES = [
+    ("5 Years", pd.DateOffset(years=5)), ("1 Year", pd.DateOffset(years=1)),
+    ("6 Months", pd.DateOffset(months=6)), ("YTD", None), ("1 Month", pd.DateOffset(months=1)),
+]
 
+# One process-wide Arrow CPU/IO pool is shared by every scan and plot read.
+pa.set_cpu_count(os.cpu_count() or 4)
+pa.set_io_thread_count(16)
 
-DATA_DIR = "local_data_store"
 
+def _last_date_from_footer(file_path, metadata=None):
+    """
+    Returns the latest date in a Parquet file using only the row-group
+    statistics in the footer, without decoding any column data. Files
+    written without statistics fall back to reading just the date column.
+    """
+    if metadata is None:
+        metadata = pq.read_metadata(file_path, memory_map=True)
+    date_idx = metadata.schema.names.index(DATE_COLUMN)
+    stats = [metadata.row_group(i).column(date_idx).statistics for i in range(metadata.num_row_groups)]
+    if stats and all(s is not None and s.has_min_max for s in stats):
+        return max(pd.Timestamp(s.max) for s in stats)
+    dates = pq.read_table(file_path, columns=[DATE_COLUMN], memory_map=True)[DATE_COLUMN]
+    return pd.Timestamp(pc.max(dates).as_py())
 
-@st.cache_data(show_spinner="Loading volatility data from cache...")
-def build_df_from_local_cache():
-    # This function is correct and remains unchanged
-    results = []
-    if not os.path.exists(DATA_DIR):
-        return pd.DataFrame()
-    parquet_files = [f for f in os.listdir(DATA_DIR) if f.endswith('.parquet')]
+
+def _matches_scan_schema(arrow_schema):
+    """
+    True when a file's columns can be cast to SCAN_SCHEMA: a timestamp date
+    column and numeric vol columns (a missing vol column just scans as null).
+    """
+    if DATE_COLUMN not in arrow_schema.names or not pa.types.is_timestamp(arrow_schema.field(DATE_COLUMN).type):
+        return False
+    return all(pa.types.is_floating(arrow_schema.field(col).type) or pa.types.is_integer(arrow_schema.field(col).type)
+               for col in SCAN_COLUMNS if col in arrow_schema.names)
+
+
+def _build_scan_dataset(parquet_files):
+    """
+    Wraps the per-ticker files in a single pyarrow Dataset. Each file gets
+    'ticker' and 'cutoff' (start of its 1Y window) as virtual partition
+    columns, so the whole cache is scanned and filtered in one pass.
+    Files that are unreadable or whose columns don't fit SCAN_SCHEMA are
+    left out, so one bad ticker cannot fail the whole scan.
+    """
+    paths, partitions = [], []
     for filename in parquet_files:
-        ticker = os.path.splitext(filename)[0]
         file_path = os.path.join(DATA_DIR, filename)
         try:
-            vol_data = pd.read_parquet(file_path)
-            offset = pd.tseries.frequencies.to_offset("1YE")
-            df_1y = vol_data[vol_data.index >= vol_data.index.max() - offset]
-            if df_1y.empty or 'IV_30D' not in df_1y.columns or 'HV_30D' not in df_1y.columns or len(df_1y) < 20:
-                continue
-            iv_series = df_1y['IV_30D']
-            current_iv = iv_series.iloc[-1]
-            iv_low_52wk = iv_series.min()
-            iv_high_52wk = iv_series.max()
-            iv_rank = (current_iv - iv_low_52wk) / (iv_high_52wk - iv_low_52wk) if (
-                                                                                               iv_high_52wk - iv_low_52wk) > 0 else np.nan
-            current_hv = df_1y['HV_30D'].iloc[-1]
-            iv_hv_ratio = current_iv / current_hv if not (np.isnan(current_hv) or current_hv == 0) else np.nan
-            if pd.isna(iv_rank) or pd.isna(iv_hv_ratio):
+            metadata = pq.read_metadata(file_path, memory_map=True)
+            if not _matches_scan_schema(metadata.schema.to_arrow_schema()):
                 continue
-            results.append({
-                "Ticker": ticker, "Current IV": current_iv,
-                "IV Rank (1Y)": iv_rank, "IV/HV Ratio": iv_hv_ratio
-            })
+            cutoff = _last_date_from_footer(file_path, metadata) - pd.tseries.frequencies.to_offset("1YE")
         except Exception:
             continue
-    return pd.DataFrame(results) if results else pd.DataFrame()
+        paths.append(file_path)
+        partitions.append((ds.field('ticker') == os.path.splitext(filename)[0]) & (ds.field('cutoff') == cutoff))
+    return ds.FileSystemDataset.from_paths(
+        paths, schema=SCAN_SCHEMA,
+        format=ds.ParquetFileFormat(default_fragment_scan_options=ds.ParquetFragmentScanOptions(pre_buffer=True)),
+        filesystem=pafs.LocalFileSystem(use_mmap=True), partitions=partitions)
 
 
-def format_df_for_display(df):
-    # This function is correct and remains unchanged
-    if df.empty: return df
-    df_display = df.copy()
-    if 'Current IV' in df_display.columns:
-        df_display['Current IV'] = df_display['Current IV'].map('{:.2%}'.format)
-    if 'IV Rank (1Y)' in df_display.columns:
-        df_display['IV Rank (1Y)'] = (df_display['IV Rank (1Y)'] * 100).map('{:.1f}'.format)
-    if 'IV/HV Ratio' in df_display.columns:
-        df_display['IV/HV Ratio'] = df_display['IV/HV Ratio'].map('{:.2f}'.format)
-    return df_display
+def _load_scan_table(parquet_files, source_mtime):
+    """
+    Returns the trimmed 1Y table (ticker, date, HV_30D, IV_30D) for all tickers.
+    It is served from a single memory-mapped Feather file, which is rebuilt
+    from the per-ticker Parquet files whenever any of them changes
+    (source_mtime is the newest mtime among them).
+    """
+    cache_path = os.path.join(DATA_DIR, SCAN_CACHE_FILENAME)
+    signature = f"{len(parquet_files)}:{source_mtime}"
+    if os.path.exists(cache_path):
+        try:
+            with pa.memory_map(cache_path) as source:
+                reader = pa.ipc.open_file(source)
+                if ((reader.schema.metadata or {}).get(b'source_signature') == signature.encode()
+                        and reader.schema.remove_metadata().equals(SCAN_TABLE_SCHEMA)):
+                    return reader.read_all()
+        except Exception:
+            pass  # Unreadable cache, rebuild it below
 
+    # Only the vol columns of rows inside each ticker's 1Y window are decoded.
+    table = _build_scan_dataset(parquet_files).to_table(
+        columns=SCAN_TABLE_SCHEMA.names, filter=ds.field(DATE_COLUMN) >= ds.field('cutoff'))
+    # One chunk gives one dictionary for the whole column, which the Feather file format requires.
+    table = table.combine_chunks()
+    table = table.set_column(0, 'ticker', pc.dictionary_encode(table['ticker']))
+    table = table.replace_schema_metadata({'source_signature': signature})
+    try:
+        tmp_path = cache_path + ".tmp"
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Read-only deployments just rebuild the table on every cold start
+    return table
 
-def plot_volatility_analysis(ticker):
+
+@st.cache_resource(show_spinner="Loading volatility data from cache...")
+def build_df_from_local_cache():
     """
-    Reads a single stock's Parquet file and generates the plot
-    using a server-safe Matplotlib backend.
+    Returns the screener results as a pyarrow Table with Ticker, Current IV,
+    IV Rank (1Y) and IV/HV Ratio columns (empty when no data is available).
+    The same Table object is shared by every session and rerun without being
+    copied; Arrow tables are immutable, so callers cannot alter it in place.
     """
-    file_path = os.path.join(DATA_DIR, f"{ticker}.parquet")
-    if not os.path.exists(file_path):
-        st.error(f"Data file not found for {ticker} in the local cache.")
-        return None
+    if not os.path.exists(DATA_DIR):
+        return pa.table({})
+    with os.scandir(DATA_DIR) as it:
+        entries = [e for e in it if e.is_file() and e.name.endswith('.parquet')]
+    parquet_files = [e.name for e in entries]
+    table = _load_scan_table(parquet_files, max((e.stat().st_mtime for e in entries), default=0))
+    if table.num_rows == 0:
+        return pa.table({})
+
+    # 'last' must see the NaN of a trailing missing value, like .iloc[-1] did.
+    keep_nulls = pc.ScalarAggregateOptions(skip_nulls=False)
+    stats = table.group_by('ticker', use_threads=False).aggregate([
+        ('IV_30D', 'min'), ('IV_30D', 'max'), ('IV_30D', 'last', keep_nulls),
+        ('HV_30D', 'last', keep_nulls), (DATE_COLUMN, 'count'),
+    ])
+
+    # The per-ticker math runs on plain NumPy arrays pulled straight from the Arrow aggregate.
+    enough_rows = stats[f'{DATE_COLUMN}_count'].to_numpy() >= 20
+    tickers = stats['ticker'].to_numpy()[enough_rows]
+    current_iv = stats['IV_30D_last'].to_numpy()[enough_rows]
+    current_hv = stats['HV_30D_last'].to_numpy()[enough_rows]
+    iv_low = stats['IV_30D_min'].to_numpy()[enough_rows]
+    iv_range = stats['IV_30D_max'].to_numpy()[enough_rows] - iv_low
+    # Flat IV ranges and zero HV divide to inf/NaN here and are masked out below.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iv_rank = (current_iv - iv_low) / iv_range
+        iv_hv_ratio = current_iv / current_hv
+    # Drop unusable tickers on the arrays so the result table is built once, from typed columns.
+    valid = np.isfinite(iv_rank) & np.isfinite(iv_hv_ratio)
+    if not valid.any():
+        return pa.table({})
+    return pa.table({
+        # Dictionary-encoded, so pandas sees the tickers as a categorical column.
+        "Ticker": pa.array(tickers[valid], pa.string()).dictionary_encode(), "Current IV": current_iv[valid],
+        "IV Rank (1Y)": iv_rank[valid], "IV/HV Ratio": iv_hv_ratio[valid],
+    })
+
 
-    vol_data = pd.read_parquet(file_path)
+@st.cache_data(show_spinner=False, max_entries=64, ttl=3600)
+def _plot_cached(ticker, mtime):
+    """
+    Builds the volatility figure for a ticker. It is rendered client-side
+    by Plotly, so the server only ships the plotted points. The file's
+    mtime is part of the cache key, so a refreshed data file rebuilds.
+    """
+    file_path = os.path.join(DATA_DIR, f"{ticker}.parquet")
+    # Only the plotted columns are decoded (IV_30D may be absent), then downcast in Arrow.
+    available = pq.read_schema(file_path, memory_map=True).names
+    table = pq.read_table(file_path, columns=[c for c in SCAN_COLUMNS + [DATE_COLUMN] if c in available],
+                          memory_map=True, pre_buffer=True)
+    table = table.cast(pa.schema([pa.field(f.name, pa.float32()) if f.name in SCAN_COLUMNS else f
+                                  for f in table.schema], metadata=table.schema.metadata))
+    vol_data = table.to_pandas(split_blocks=True, self_destruct=True)
+    if not vol_data.index.is_monotonic_increasing:
+        vol_data = vol_data.sort_index()
+    # Timeframe windows are located by binary search on the sorted dates instead of boolean masks.
+    idx_values = vol_data.index.values
 
-    timeframes = {"5 Years": "5Y", "1 Year": "1Y", "6 Months": "6M", "YTD": "YTD", "1 Month": "1M"}
-    fig, axes = plt.subplots(len(timeframes), 1, figsize=(12, 18))
-    fig.suptitle(f'Historical vs. Implied Volatility for {ticker}', fontsize=16, y=0.99)
+    idx_max = vol_data.index.max()
+    fig = make_subplots(rows=len(TIMEFRAMES), cols=1, subplot_titles=[name for name, _ in TIMEFRAMES],
+                        vertical_spacing=0.05)
 
-    for i, (name, period) in enumerate(timeframes.items()):
+    for i, (name, offset) in enumerate(TIMEFRAMES):
         plot_data = pd.DataFrame()
 
         try:
-            if period == 'YTD':
+            if offset is None:
                 current_year = datetime.now().year
-                mask = vol_data.index.year == current_year
-                plot_data = vol_data[mask]
+                i0, i1 = np.searchsorted(idx_values, [np.datetime64(f'{current_year}-01-01'),
+                                                      np.datetime64(f'{current_year + 1}-01-01')])
+                plot_data = vol_data.iloc[i0:i1]
             else:
-                offset = pd.tseries.frequencies.to_offset(period)
-                start_date = vol_data.index.max() - offset
-                plot_data = vol_data[vol_data.index >= start_date]
+                start_date = idx_max - offset
+                plot_data = vol_data.iloc[np.searchsorted(idx_values, start_date.to_datetime64()):]
         except Exception:
             plot_data = pd.DataFrame()  # Ensure it's empty on any error
 
-        ax = axes[i]
+        row = i + 1
 
         if not plot_data.empty:
-            ax.plot(plot_data.index, plot_data['HV_30D'], label='30-Day Historical Vol (HV)', color='royalblue')
+            # Only the first panel's traces go in the legend; the rest share their legend group.
+            fig.add_trace(go.Scattergl(x=plot_data.index, y=plot_data['HV_30D'], mode='lines',
+                                       name='30-Day Historical Vol (HV)', line_color='royalblue',
+                                       legendgroup='HV', showlegend=i == 0), row=row, col=1)
             if 'IV_30D' in plot_data.columns and not plot_data['IV_30D'].isnull().all():
-                ax.plot(plot_data.index, plot_data['IV_30D'], label='30-Day Implied Vol (IV)', color='red')
-            ax.legend()
+                fig.add_trace(go.Scattergl(x=plot_data.index, y=plot_data['IV_30D'], mode='lines',
+                                           name='30-Day Implied Vol (IV)', line_color='red',
+                                           legendgroup='IV', showlegend=i == 0), row=row, col=1)
         else:
-            ax.text(0.5, 0.5, 'No Data Available for this Timeframe', horizontalalignment='center',
-                    verticalalignment='center', transform=ax.transAxes)
+            fig.add_annotation(text='No Data Available for this Timeframe', showarrow=False, x=0.5, y=0.5,
+                               xref='x domain', yref='y domain', row=row, col=1)
 
-        ax.set_title(name)
-        ax.set_ylabel("Annualized Volatility")
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: f'{y:.0%}'))
-        ax.grid(True, linestyle='--')
+        fig.update_yaxes(title_text="Annualized Volatility", tickformat='.0%', griddash='dash', row=row, col=1)
 
-    plt.tight_layout(rect=[0, 0, 1, 0.97])
+    fig.update_layout(title_text=f'Historical vs. Implied Volatility for {ticker}', height=1800)
     return fig
 
 
+def plot_volatility_analysis(ticker):
+    """
+    Returns the Plotly volatility figure for a single stock from the
+    local cache, or None when its Parquet file is missing.
+    """
+    file_path = os.path.join(DATA_DIR, f"{ticker}.parquet")
+    if not os.path.exists(file_path):
+        st.error(f"Data file not found for {ticker} in the local cache.")
+        return None
+    return _plot_cached(ticker, os.path.getmtime(file_path))
+
+
+@st.cache_resource(show_spinner=False)
+def sorted_screener_view():
+    """
+    Returns the screener results sorted by IV Rank as a display-ready pandas
+    DataFrame (IV Rank rescaled to 0-100), plus a tuple of tickers for the
+    selectbox. Both objects are built once and shared by every session and
+    rerun, so the selectbox gets the same options every time; callers must
+    not mutate the DataFrame in place.
+    """
+    table = build_df_from_local_cache()
+    if table.num_rows == 0:
+        return pd.DataFrame(), ()
+    # Filter and sort with Arrow kernels; pandas is only needed for display.
+    # Arrow treats NaN as valid, so both nulls and NaNs are dropped to match dropna().
+    rank = table['IV Rank (1Y)']
+    table = table.filter(pc.and_(pc.is_valid(rank), pc.invert(pc.is_nan(rank)))).sort_by(
+        [('IV Rank (1Y)', 'descending')])
+    df = table.to_pandas()
+    df["IV Rank (1Y)"] *= 100
+    return df, tuple(table['Ticker'].cast(pa.string()).to_pylist())
+
+
 # --- Main Application UI ---
 st.set_page_config(layout="wide")
 st.title("📊 S&P 500 Volatility Screener (Snapshot)")
@@ -122,8 +273,7 @@ st.title("📊 S&P 500 Volatility Screener (Snapshot)")
 try:
     sample_file_path = os.path.join(DATA_DIR, "AAPL.parquet")
     if os.path.exists(sample_file_path):
-        sample_df = pd.read_parquet(sample_file_path)
-        last_data_date = sample_df.index.max()
+        last_data_date = _last_date_from_footer(sample_file_path)
         last_updated_str = last_data_date.strftime('%Y-%m-%d')
         st.write(f"This application displays a snapshot of volatility data. **Data as of: {last_updated_str}**")
     else:
@@ -131,15 +281,22 @@ try:
 except Exception:
     st.write("This application displays a snapshot of volatility data.")
 
-full_df = build_df_from_local_cache()
+final_df_sorted, ticker_options = sorted_screener_view()
 
-if full_df.empty:
+if final_df_sorted.empty:
     st.error("Volatility data is not available. The application's data files may be missing from the repository.")
 else:
-    final_df_sorted = full_df.sort_values(by="IV Rank (1Y)", ascending=False).dropna(subset=['IV Rank (1Y)'])
-
     st.subheader("Volatility Screener Results (Sorted by IV Rank)")
-    st.dataframe(format_df_for_display(final_df_sorted), use_container_width=True)
+    # Values stay numeric and are formatted by the browser.
+    st.dataframe(
+        final_df_sorted,
+        width="stretch",
+        column_config={
+            "Current IV": st.column_config.NumberColumn(format="percent"),
+            "IV Rank (1Y)": st.column_config.NumberColumn(format="%.1f"),
+            "IV/HV Ratio": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
 
     st.subheader("Detailed Volatility Analysis")
 
@@ -148,14 +305,14 @@ else:
     with tab1:
         st.write("Select a stock from the high IV Rank list above.")
         selected_ticker_from_list = st.selectbox(
-            "Choose a stock:", options=final_df_sorted['Ticker'].tolist(), key="selectbox_public"
+            "Choose a stock:", options=ticker_options, key="selectbox_public"
         )
         if selected_ticker_from_list and st.button(f"Generate Volatility Plot for {selected_ticker_from_list}",
                                                    key="button_selectbox_public"):
             with st.spinner(f"Loading plot data for {selected_ticker_from_list}..."):
                 fig = plot_volatility_analysis(selected_ticker_from_list)
                 if fig:
-                    st.pyplot(fig)
+                    st.plotly_chart(fig, width="stretch")
 
     with tab2:
         st.write("Enter any valid stock ticker for a custom volatility analysis.")
@@ -164,7 +321,7 @@ else:
             with st.spinner(f"Loading plot data for {custom_ticker}..."):
                 fig = plot_volatility_analysis(custom_ticker)
                 if fig:
-                    st.pyplot(fig)
+                    st.plotly_chart(fig, width="stretch")
 
 st.markdown("---")
 st.write("Built by a Volatility Agent.")
\ No newline at end of file
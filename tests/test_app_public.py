@@ -0,0 +1,124 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_public  # noqa: E402
+
+NO_DATA = 'No Data Available for this Timeframe'
+
+
+def _write_vol_file(directory, ticker, dates):
+    index = pd.DatetimeIndex(dates, name='date')
+    values = np.linspace(0.2, 0.4, len(index))
+    pd.DataFrame({'HV_30D': values, 'IV_30D': values}, index=index).to_parquet(
+        os.path.join(directory, f"{ticker}.parquet"))
+
+
+def _no_data_panels(fig):
+    return [a for a in fig.layout.annotations if a.text == NO_DATA]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_public, 'DATA_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_plot_empty_file_marks_every_panel(data_dir):
+    _write_vol_file(data_dir, 'ZZEMPTY', [])
+
+    fig = app_public.plot_volatility_analysis('ZZEMPTY')
+
+    assert len(fig.data) == 0
+    assert len(_no_data_panels(fig)) == len(app_public.TIMEFRAMES)
+
+
+def test_plot_marks_only_filtered_out_panels(data_dir):
+    # Data ending years ago: every look-back panel has data, the YTD panel is filtered out.
+    _write_vol_file(data_dir, 'ZZOLD', pd.bdate_range('2018-01-01', '2019-06-28'))
+
+    fig = app_public.plot_volatility_analysis('ZZOLD')
+
+    assert len(_no_data_panels(fig)) == 1
+    assert len(fig.data) == 2 * (len(app_public.TIMEFRAMES) - 1)
+
+
+def test_last_date_without_footer_statistics(data_dir):
+    dates = pd.bdate_range('2024-01-01', '2024-12-31')
+    _write_vol_file(data_dir, 'ZZSTATS', dates)
+    table = pq.read_table(os.path.join(data_dir, 'ZZSTATS.parquet'))
+    pq.write_table(table, os.path.join(data_dir, 'ZZNOSTATS.parquet'), write_statistics=False)
+
+    assert app_public._last_date_from_footer(os.path.join(data_dir, 'ZZSTATS.parquet')) == dates[-1]
+    assert app_public._last_date_from_footer(os.path.join(data_dir, 'ZZNOSTATS.parquet')) == dates[-1]
+    dataset = app_public._build_scan_dataset(['ZZSTATS.parquet', 'ZZNOSTATS.parquet'])
+    assert len(list(dataset.get_fragments())) == 2
+
+
+def test_scan_skips_files_that_do_not_fit_the_scan_schema(data_dir):
+    dates = pd.bdate_range('2024-01-01', '2024-12-31')
+    _write_vol_file(data_dir, 'ZZGOOD', dates)
+    pd.DataFrame({'HV_30D': ['x'] * len(dates), 'IV_30D': 0.3}, index=pd.DatetimeIndex(dates, name='date')).to_parquet(
+        os.path.join(data_dir, 'ZZBAD.parquet'))
+
+    dataset = app_public._build_scan_dataset(['ZZGOOD.parquet', 'ZZBAD.parquet'])
+    table = dataset.to_table(columns=['ticker', 'HV_30D'])
+
+    assert set(table['ticker'].to_pylist()) == {'ZZGOOD'}
+
+
+def _load_scan_table(data_dir):
+    parquet_files = sorted(f for f in os.listdir(data_dir) if f.endswith('.parquet'))
+    source_mtime = max((os.path.getmtime(os.path.join(data_dir, f)) for f in parquet_files), default=0)
+    return app_public._load_scan_table(parquet_files, source_mtime)
+
+
+def test_scan_cache_rebuilds_when_ticker_files_change(data_dir, monkeypatch):
+    builds = []
+    build_scan_dataset = app_public._build_scan_dataset
+
+    def counting_build(parquet_files):
+        builds.append(list(parquet_files))
+        return build_scan_dataset(parquet_files)
+
+    monkeypatch.setattr(app_public, '_build_scan_dataset', counting_build)
+    dates = pd.bdate_range('2024-01-01', '2024-12-31')
+    for ticker in ('ZZA', 'ZZB'):
+        _write_vol_file(data_dir, ticker, dates)
+    cache_path = os.path.join(data_dir, app_public.SCAN_CACHE_FILENAME)
+
+    first = _load_scan_table(data_dir)
+    assert os.path.exists(cache_path) and len(builds) == 1
+    assert _load_scan_table(data_dir).equals(first) and len(builds) == 1
+
+    # A newer mtime on any ticker file invalidates the cache.
+    future = os.path.getmtime(os.path.join(data_dir, 'ZZA.parquet')) + 60
+    os.utime(os.path.join(data_dir, 'ZZA.parquet'), (future, future))
+    _load_scan_table(data_dir)
+    assert len(builds) == 2
+
+    # So does removing a ticker file, even though the max mtime is unchanged.
+    os.remove(os.path.join(data_dir, 'ZZB.parquet'))
+    table = _load_scan_table(data_dir)
+    assert len(builds) == 3
+    assert set(table['ticker'].to_pylist()) == {'ZZA'}
+    assert not os.path.exists(cache_path + '.tmp')
+
+
+def test_scan_cache_rebuilds_on_schema_mismatch(data_dir):
+    _write_vol_file(data_dir, 'ZZA', pd.bdate_range('2024-01-01', '2024-12-31'))
+    table = _load_scan_table(data_dir)
+    cache_path = os.path.join(data_dir, app_public.SCAN_CACHE_FILENAME)
+
+    # Same source signature, but an outdated column layout.
+    stale = table.set_column(2, 'HV_30D', table['HV_30D'].cast('float64'))
+    feather.write_feather(stale, cache_path, compression='uncompressed')
+
+    assert _load_scan_table(data_dir).schema.field('HV_30D').type == 'float'